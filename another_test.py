@@ -1,70 +1,51 @@
 from typing import Callable, Self, Any
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from functools import cache
 
+_MISSING = object()
 
-class LazyList:
-    __functions: list[Callable[[], list]]
-    __values: dict[int, Any] = {}
-    __index = 0
-    __caching = True
 
+class LazyList:
     def __init__(self: Self, fn: list[Callable]) -> None:
-        self.__functions = fn
+        self.__functions: list[Callable[[], Any]] = fn
+        self.__values: dict[int, Any] = {}
+        self.__caching = True
 
     def __getitem__(self: Self, item: int) -> Any:
         if type(item) is int:
+            functions = self.__functions
             if self.__caching:
-                if self.__values.get(item) is None:
-                    self.__values[item] = self.__functions[item]()
-                    return self.__values[item]
-                else:
-                    return self.__values[item]
+                values = self.__values
+                value = values.get(item, _MISSING)
+                if value is _MISSING:
+                    value = values[item] = functions[item]()
+                return value
             else:
-                return self.__functions[item]()
+                return functions[item]()
 
     def __iter__(self):
-        self.__index = 0
-        return self
-
-    def __next__(self):
-        if self.__index < len(self.__functions):
+        values = self.__values
+        for i, fn in enumerate(self.__functions):
             if self.__caching:
-                if self.__values.get(self.__index) is None:
-                    self.__values[self.__index] = self.__functions[self.__index]()
-                    result = self.__values[self.__index]
-                    self.__index += 1
-                    return result
-                else:
-                    result = self.__values[self.__index]
-                    self.__index += 1
-                    return result
+                value = values.get(i, _MISSING)
+                if value is _MISSING:
+                    value = values[i] = fn()
+                yield value
             else:
-                self.__index += 1
-                return self.__functions[self.__index - 1]()
-        else:
-            raise StopIteration
-
-    def __aiter__(self):
-        self.__index = 0
-        return self
+                yield fn()
 
-    async def __anext__(self):
-        if self.__index < len(self.__functions):
+    async def __aiter__(self):
+        values = self.__values
+        for i, fn in enumerate(self.__functions):
             if self.__caching:
-                if self.__values.get(self.__index) is None:
-                    self.__values[self.__index] = self.__functions[self.__index]()
-                    result = self.__values[self.__index]
-                    self.__index += 1
-                    return result
-                else:
-                    result = self.__values[self.__index]
-                    self.__index += 1
-                    return result
+                value = values.get(i, _MISSING)
+                if value is _MISSING:
+                    value = values[i] = fn()
+                yield value
             else:
-                self.__index += 1
-                return self.__functions[self.__index - 1]()
-        else:
-            raise StopAsyncIteration
+                yield fn()
 
     def __delitem__(self, item: int):
         del self.__values[item]
@@ -75,18 +56,40 @@ class LazyList:
     def __repr__(self) -> str:
         return str(self.__values)
 
+    def __missing_indices(self, elements: int) -> list[int]:
+        indices = range(min(elements, len(self.__functions)))
+        if not self.__caching:
+            return list(indices)
+        values = self.__values
+        return [i for i in indices if i not in values]
+
+    def __store(self, elements: int, indices: list[int], results: list) -> list:
+        if not self.__caching:
+            return results
+        values = self.__values
+        values.update(zip(indices, results))
+        return [values[i] for i in range(min(elements, len(self.__functions)))]
+
     @contextmanager
     def prefetch(self, elements: int):
-        result = []
-        for idx, fn in enumerate(self.__functions[:elements]):
-            if self.__caching:
-                if self.__values.get(idx) is None:
-                    self.__values[idx] = fn()
-                    result.append(self.__values[idx])
-                else:
-                    result.append(self.__values[idx])
-            else:
-                result.append(fn())
+        missing = self.__missing_indices(elements)
+        results = []
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(len(missing), 32)) as pool:
+                results = list(pool.map(lambda i: self.__functions[i](), missing))
+        result = self.__store(elements, missing, results)
+        try:
+            yield result
+        finally:
+            ...
+
+    @asynccontextmanager
+    async def aprefetch(self, elements: int):
+        missing = self.__missing_indices(elements)
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.__functions[i]) for i in missing)
+        )
+        result = self.__store(elements, missing, results)
         try:
             yield result
         finally:
@@ -101,18 +104,20 @@ class LazyList:
             self.__caching = True
 
     def clear_cache(self):
-        self.__values = {}
+        self.__values.clear()
 
     @property
     def computed_nodes(self):
         return len(self.__values)
 
 
+@cache
 def slow_fib(n: int) -> int:
-    """Intentionally slow recursive Fibonacci."""
-    if n < 2:
-        return n
-    return slow_fib(n - 1) + slow_fib(n - 2)
+    """Iterative Fibonacci, memoized so each `n` is only computed once."""
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
 
 # Create LazyList of slow Fibonacci computations
 lazy_fibs = LazyList([lambda n=n: slow_fib(n) for n in range(32, 37)])
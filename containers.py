@@ -1,44 +1,79 @@
+import asyncio
 import docker
+import io
 import os
 import tarfile
+from collections import defaultdict
 from docker.models.containers import Container
+from typing import IO, Callable, TypeVar
+
+T = TypeVar("T")
 
 client = docker.from_env()
 
 
+def _tar_files(files: list[tuple[str, str]]) -> bytes:
+    """Pack (source path, archive name) pairs into one in-memory tar."""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for src, arcname in files:
+            tar.add(src, arcname=arcname)
+    return buf.getvalue()
+
+
 def copy_to(src, dst):
     name, dst = dst.split(":")
     container = client.containers.get(name)
 
-    os.chdir(os.path.dirname(src))
-    srcname = os.path.basename(src)
-    tar = tarfile.open(src + ".tar", mode="w")
-    try:
-        tar.add(srcname)
-    finally:
-        tar.close()
-
-    data: bytes = open(src + ".tar", "rb").read()
+    data = _tar_files([(src, os.path.basename(src))])
     container.put_archive(os.path.dirname(dst), data)
 
 
+def _get_or_run(name: str) -> Container:
+    try:
+        # left over from an earlier session (or stopped): docker would refuse a
+        # second container with the same name, so pick this one up instead
+        container: Container = client.containers.get(name)
+    except docker.errors.NotFound:
+        return client.containers.run(
+            "8e39204f13a6",  # python 3.13.7-slim
+            command="sleep 3600",
+            name=name,
+            detach=True,
+            tty=True,
+        )
+
+    container.start()
+    return container
+
+
 async def init_container(name: str) -> Container:
-    container: Container = client.containers.run(
-        "8e39204f13a6",  # python 3.13.7-slim
-        command="sleep 3600",
-        name=name,
-        detach=True,
-        tty=True,
-    )
+    # creating and starting the container takes seconds, keep it off the loop
+    return await asyncio.to_thread(_get_or_run, name)
 
-    return container
+
+def remove_container(container: Container) -> None:
+    """Stop and delete `container`, best effort (it may already be gone)."""
+    try:
+        container.remove(force=True)
+    except docker.errors.APIError:
+        pass
 
 
 def upload_file(path: str | dict[str, str], container: Container):
-    if isinstance(path, dict):
-        for p in path.keys():
-            copy_to(p, f"{container.name}:/{path[p]}")
-    copy_to(path, f"{container.name}:/main.py")
+    if isinstance(path, str):
+        # into / under its own name, like copy_to, but without looking the
+        # container up again by name (one docker API round trip per upload)
+        path = {path: os.path.basename(path)}
+
+    # one archive (and one put_archive round trip) per destination directory
+    groups: dict[str, list[tuple[str, str]]] = defaultdict(list)
+    for src, dst in path.items():
+        dst = "/" + dst.lstrip("/")
+        arcname = os.path.basename(dst) or os.path.basename(src)
+        groups[os.path.dirname(dst)].append((src, arcname))
+    for directory, files in groups.items():
+        container.put_archive(directory, _tar_files(files))
 
 
 def run_script(filename: str, container: Container) -> str:
@@ -53,15 +88,57 @@ def run_command(command: str, container: Container) -> str:
     return out.output.decode()
 
 
-def download_files(container: Container, files: list[str]) -> list[bytes]:
-    tars = []
-    for p in files:
-        stream, _ = container.get_archive(p)
-        chunks = []
-        for chunk in stream:
-            chunks.append(chunk)
-        tars.append(b"".join(chunks))
-    return tars
+class _ChunkStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks."""
+
+    def __init__(self, chunks):
+        self.__chunks = iter(chunks)
+        self.__pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self.__pending:
+            chunk = next(self.__chunks, None)
+            if chunk is None:
+                return 0
+            self.__pending = memoryview(chunk)
+        n = min(len(b), len(self.__pending))
+        b[:n] = self.__pending[:n]
+        self.__pending = self.__pending[n:]
+        return n
+
+    def close(self) -> None:
+        # stop the docker response generator too, not just this wrapper
+        close = getattr(self.__chunks, "close", None)
+        if close is not None:
+            close()
+        super().close()
+
+
+def _walk_one(container: Container, path: str, walk: Callable[[IO[bytes]], T]) -> T:
+    stream, _ = container.get_archive(path)
+    with io.BufferedReader(_ChunkStream(stream)) as f:
+        return walk(f)
+
+
+async def download_files(
+    container: Container, files: list[str], walk: Callable[[IO[bytes]], T]
+) -> list[T]:
+    """
+    Stream the tar archive of each of `files` into `walk` (e.g. tarfile mode
+    "r|") and return its results. Each archive is read, and `walk` run, in a
+    worker thread, so the archive is never held in memory as a whole.
+    """
+    # cap how many archives are streamed from the docker daemon at once
+    semaphore = asyncio.Semaphore(8)
+
+    async def fetch(path: str) -> T:
+        async with semaphore:
+            return await asyncio.to_thread(_walk_one, container, path, walk)
+
+    return list(await asyncio.gather(*(fetch(p) for p in files)))
 
 
 def get_file_type(filename: str) -> str:
@@ -1,14 +1,17 @@
-import pandas as pd
-import networkx as nx
-from nltk import word_tokenize, pos_tag
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from statistics import mean
-import matplotlib.pyplot as plt
+from __future__ import annotations
+
+from functools import cache, lru_cache
+from typing import TYPE_CHECKING
 
 from mcp.server.fastmcp import Context
 from mcp.server.session import ServerSession
 
+# pandas, networkx, matplotlib and nltk take seconds to import, so they are
+# only imported once a graph is actually built
+if TYPE_CHECKING:
+    import pandas as pd
+    from matplotlib.figure import Figure
+
 
 # import nltk
 # nltk.download("punkt")
@@ -18,121 +21,151 @@ from mcp.server.session import ServerSession
 # nltk.download("wordnet")
 
 
-def extract_svo(sentence: str, stop_words: set, lemmatizer: WordNetLemmatizer):
-    tokens = word_tokenize(sentence)
-    tagged = pos_tag(tokens)
+_WORDNET_POS = {"NN": "n", "VB": "v"}
 
-    # simple subject: first noun (NN, NNP, NNS, NNPS)
-    subject = next((w for w, p in tagged if p.startswith("NN")), None)
 
-    # simple verb: first verb (VB*)
-    verb_idx = None
-    verb = None
-    for i, (w, p) in enumerate(tagged):
-        if p.startswith("VB"):
-            verb = w
-            verb_idx = i
-            break
-
-    # simple object: first noun after the verb
-    target = None
-    if verb_idx is not None:
-        for w, p in tagged[verb_idx + 1 :]:
-            if p.startswith("NN"):
-                target = w
-                break
+@cache
+def _lemmatizer():
+    from nltk.stem import WordNetLemmatizer
+
+    # token frequencies are Zipfian, so most (word, pos) pairs repeat across sentences
+    return lru_cache(maxsize=100_000)(WordNetLemmatizer().lemmatize)
 
-    # cleaned / lemmatized relation (verb)
-    relation = lemmatizer.lemmatize(verb, "v") if verb else None
 
-    # processed sentence: lower, remove stopwords, lemmatize nouns/verbs
+@cache
+def _stop_words() -> frozenset[str]:
+    from nltk.corpus import stopwords
+
+    # loaded on first use rather than at import, so a missing corpus only
+    # fails the call that needs it (see the nltk.download calls above)
+    return frozenset(stopwords.words("english"))
+
+
+def extract_svo(tagged: list[tuple[str, str]]):
+    stop_words = _stop_words()
+    lemmatize = _lemmatizer()
+
+    # single pass over the tagged tokens:
+    #   subject: first noun (NN, NNP, NNS, NNPS)
+    #   verb:    first verb (VB*)
+    #   object:  first noun after the verb
+    #   processed sentence: lower, remove stopwords, lemmatize nouns/verbs
+    subject = verb = target = None
     proc_tokens = []
     for w, p in tagged:
+        tag = p[:2]
+        if tag == "NN":
+            if subject is None:
+                subject = w
+            if verb is not None and target is None:
+                target = w
+        elif tag == "VB" and verb is None:
+            verb = w
+
         wl = w.lower()
         if wl.isalnum() and wl not in stop_words:
-            pos = "n" if p.startswith("NN") else "v" if p.startswith("VB") else "a"
-            proc_tokens.append(lemmatizer.lemmatize(wl, pos))
+            proc_tokens.append(lemmatize(wl, _WORDNET_POS.get(tag, "a")))
+
+    # cleaned / lemmatized relation (verb)
+    relation = lemmatize(verb, "v") if verb else None
     processed = " ".join(proc_tokens)
 
     return subject, target, relation, processed
 
 
 async def knowledge_graph(
-    title: str, sentences: list[str], ctx: Context[ServerSession, None]
-) -> pd.DataFrame:
+    title: str,
+    sentences: list[str],
+    ctx: Context[ServerSession, None],
+    draw: bool = False,
+) -> tuple[pd.DataFrame, Figure | None]:
     """Input: list[str] sentences ONLY.
     Output: DataFrame with columns: sentence, source, target, relation, processed_sentence
+    and, with `draw=True`, a new figure of the graph (None otherwise). The figure is
+    not registered with pyplot, so concurrent calls cannot draw onto each other's.
     """
+    import pandas as pd
+    from nltk import word_tokenize, pos_tag_sents
+
     await ctx.info("Info: Creating graph")
 
-    stop_words = set(stopwords.words("english"))
-    lemmatizer = WordNetLemmatizer()
-
-    plt.figure(figsize=(8, 6))
-    plt.clf()
-
-    rows = []
-    for s in sentences:
-        src, tgt, rel, proc = extract_svo(s, stop_words, lemmatizer)
-        rows.append(
-            {
-                "sentence": s,
-                "source": src or "",
-                "target": tgt or "",
-                "relation": rel or "",
-                "processed_sentence": proc,
-            }
-        )
+    # tag all sentences in one batch instead of once per sentence
+    tagged_sentences = pos_tag_sents([word_tokenize(s) for s in sentences])
+
+    # collect columns directly rather than a list of per-row dicts
+    sources, targets, relations, processed = [], [], [], []
+    for tagged in tagged_sentences:
+        src, tgt, rel, proc = extract_svo(tagged)
+        sources.append(src or "")
+        targets.append(tgt or "")
+        relations.append(rel or "")
+        processed.append(proc)
 
-    pd.set_option("display.max_columns", 250)
-    pd.set_option("display.max_colwidth", 250000000)
     df = pd.DataFrame(
-        rows,
+        {
+            "sentence": sentences,
+            "source": sources,
+            "target": targets,
+            "relation": relations,
+            "processed_sentence": processed,
+        }
     )
 
     await ctx.info("Info: Structuring Data")
 
-    # build directed graph
-    G = nx.DiGraph()
-    for _, r in df.iterrows():
-        src, tgt, rel = r["source"], r["target"], r["relation"]
-        if src and tgt:
-            G.add_node(src)
-            G.add_node(tgt)
-            G.add_edge(src, tgt, relation=rel)
-
-    await ctx.info("Info: Computing Nodes")
-
-    # compute node colors (highlight node(s) with max degree)
-    if len(G) > 0:
-        node_degrees = dict(G.degree)
-        node_colors = [
-            (
-                "lightgreen"
-                if node_degrees[n] >= mean(node_degrees.values())
-                else "lightblue"
+    # the graph only feeds the figure, so skip it (and the layout) when not drawing
+    fig = None
+    if draw:
+        import numpy as np
+        import networkx as nx
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(8, 6))
+        FigureCanvasAgg(fig)
+        # the full-figure axes nx.draw adds on its own when given none
+        ax = fig.add_axes((0, 0, 1, 1))
+
+        # build directed graph
+        G = nx.DiGraph()
+        G.add_edges_from(
+            (src, tgt, {"relation": rel})
+            for src, tgt, rel in zip(sources, targets, relations)
+            if src and tgt
+        )
+
+        await ctx.info("Info: Computing Nodes")
+
+        # compute node colors (highlight node(s) with at least average degree);
+        # G.degree iterates in G.nodes() order, which is what nx.draw expects
+        if len(G) > 0:
+            degrees = np.fromiter(
+                (d for _, d in G.degree), dtype=np.int64, count=len(G)
             )
-            for n in G.nodes()
-        ]
-
-    else:
-        node_colors = []
-
-    # positions for layout (caller may visualize using networkx.draw)
-    pos = nx.spring_layout(G, seed=42, k=1.5)
-
-    labels = nx.get_edge_attributes(G, "relation")
-    nx.draw(
-        G,
-        pos,
-        with_labels=True,
-        font_weight="bold",
-        node_size=700,
-        node_color=node_colors,
-        font_size=8,
-        arrowsize=10,
-    )
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=labels, font_size=8)
-    plt.title(title)
+            node_colors = np.where(
+                degrees >= degrees.mean(), "lightgreen", "lightblue"
+            ).tolist()
+
+        else:
+            node_colors = []
+
+        # positions for layout, capped at 20 Fruchterman-Reingold iterations
+        pos = nx.spring_layout(G, seed=42, k=1.5, iterations=20)
+
+        labels = nx.get_edge_attributes(G, "relation")
+        nx.draw(
+            G,
+            pos,
+            with_labels=True,
+            font_weight="bold",
+            node_size=700,
+            node_color=node_colors,
+            font_size=8,
+            arrowsize=10,
+            ax=ax,
+        )
+        nx.draw_networkx_edge_labels(G, pos, edge_labels=labels, font_size=8, ax=ax)
+        ax.set_title(title)
+
     await ctx.info("Info: Done!")
-    return df
+    return df, fig
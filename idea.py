@@ -1,12 +1,55 @@
 import ast
 import hashlib
+import os
+import pickle
 import python_minifier
-import binascii
 import random
 import string
+import sys
+from functools import lru_cache
+from typing import Any, Callable, cast
 
 
-class ImportRenamer(ast.NodeTransformer):
+class _DispatchTransformer(ast.NodeTransformer):
+    """
+    NodeTransformer that resolves `visit_<NodeType>` methods once per instance instead of
+    building the method name and calling getattr for every visited node.
+    """
+
+    # node classes as class attributes, so hot visitors skip the global `ast` lookup
+    _Name = ast.Name
+    _Load = ast.Load
+    _Tuple = ast.Tuple
+    _List = ast.List
+
+    def __init__(self) -> None:
+        self._dispatch: dict[type, Callable[[ast.AST], Any]] = {}
+        for attr in dir(type(self)):
+            if attr.startswith("visit_"):
+                node_type = getattr(ast, attr.removeprefix("visit_"), None)
+                if isinstance(node_type, type):
+                    self._dispatch[node_type] = getattr(self, attr)
+
+    def visit(self, node: ast.AST) -> Any:
+        return self._dispatch.get(type(node), self.generic_visit)(node)
+
+    def _visit_list(self, nodes: list, start: int = 0) -> None:
+        # visit nodes[start:] in place, only writing back nodes that were replaced
+        visit = self.visit
+        for i in range(start, len(nodes)):
+            node = nodes[i]
+            new = visit(node)
+            if new is not node:
+                nodes[i] = new
+
+
+@lru_cache(maxsize=None)
+def _name_hash(name: str) -> str:
+    # 3-byte BLAKE2b digest == exactly the 6 hex chars used in aliases
+    return hashlib.blake2b(name.encode("utf8"), digest_size=3).hexdigest()
+
+
+class ImportRenamer(_DispatchTransformer):
     """
     1) For every import/import-from without an asname, create an alias (e.g. import uuid -> import uuid as _a1b2)
     2) Record mapping original_name -> alias_name (original_name is the simple name that appears in code)
@@ -15,86 +58,126 @@ class ImportRenamer(ast.NodeTransformer):
     4) Update Global/Nonlocal declarations that name the original imports to the alias.
     """
 
-    def __init__(self, seed: int | None = None):
+    def __init__(self, seed: int | None = None) -> None:
+        super().__init__()
         self.name_map: dict[str, str] = {}  # original -> alias
-        self.scopes: list[set[str]] = []  # stack of sets: bound names in each scope
+        self._aliases: dict[str, str] = {}  # original -> generated alias
+        # bound names of all open scopes in one flat list; each scope is the slice
+        # starting at its entry in _scope_starts
+        self._arena: list[str] = []
+        self._scope_starts: list[int] = []
+        # name -> depths of the open scopes binding it, innermost last
+        self._bind_depths: dict[str, list[int]] = {}
         self.random = random.Random(seed)
 
     # ----------------------
     # Alias generation
     # ----------------------
     def _make_alias(self, name: str) -> str:
-        # Example deterministic-ish alias: _<4-hex-hash><3-randomletters>
-        h = hashlib.md5(name.encode("utf8")).hexdigest()[:6]
+        # Example deterministic-ish alias: _<6-hex-hash><3-randomletters>
+        h = _name_hash(name)
         suf = "".join(self.random.choices(string.ascii_lowercase, k=3))
         return f"_{h}{suf}"
 
+    def _alias_for(self, name: str) -> str:
+        # every import of the same name shares one alias, since all imports are aliased
+        # before any use of the name is rewritten
+        if name not in self._aliases:
+            self._aliases[name] = self._make_alias(name)
+        return self._aliases[name]
+
     # ----------------------
     # Scope helpers
     # ----------------------
-    def _push_scope(self):
-        self.scopes.append(set())
-
-    def _pop_scope(self):
-        self.scopes.pop()
-
-    def _bind_name(self, name: str):
-        if not self.scopes:
+    def _push_scope(self) -> None:
+        self._scope_starts.append(len(self._arena))
+
+    def _pop_scope(self) -> None:
+        start = self._scope_starts.pop()
+        for name in self._arena[start:]:
+            depths = self._bind_depths[name]
+            depths.pop()
+            if not depths:
+                del self._bind_depths[name]
+        del self._arena[start:]
+
+    def _bind_name(self, name: str) -> None:
+        if not self._scope_starts:
             self._push_scope()
-        self.scopes[-1].add(name)
+        depth = len(self._scope_starts)
+        depths = self._bind_depths.setdefault(name, [])
+        if not depths or depths[-1] != depth:
+            depths.append(depth)
+            self._arena.append(name)
 
     def _is_bound_in_any_scope(self, name: str) -> bool:
         # If name is bound in the current scope or any enclosing scope, return True
-        for s in reversed(self.scopes):
-            if name in s:
-                return True
-        return False
+        return name in self._bind_depths
 
     # ----------------------
     # Visitors that create aliases and record bindings
     # ----------------------
-    def visit_Module(self, node: ast.Module):
+    # statement-list fields; imports are statements, so they can only appear in these
+    _STMT_LIST_FIELDS = ("body", "orelse", "handlers", "finalbody", "cases")
+
+    def visit_Module(self, node: ast.Module) -> ast.AST:
         # create top-level scope
         self._push_scope()
-        # visit imports (visit_Import / visit_ImportFrom will create aliases and bind alias names)
+        # phase 1: create aliases for every import without descending into expressions
+        self._collect_imports(node)
+        # phase 2: bind aliases and rewrite Name loads over the full tree
         self.generic_visit(node)
         return node
 
-    def visit_Import(self, node: ast.Import):
-        # For each alias in "import foo as bar" if asname is None -> create alias, record mapping,
-        # and mark alias as bound in current scope.
+    def _collect_imports(self, node: ast.AST) -> None:
+        for field in self._STMT_LIST_FIELDS:
+            for child in getattr(node, field, ()):
+                if isinstance(child, ast.Import):
+                    self._alias_import(child)
+                elif isinstance(child, ast.ImportFrom):
+                    self._alias_import_from(child)
+                else:
+                    self._collect_imports(child)
+
+    def _alias_import(self, node: ast.Import) -> None:
+        # For each alias in "import foo as bar" if asname is None -> create alias and record mapping
         for alias in node.names:
             # the name commonly used in code is the top-level part (e.g. "os.path" -> "os")
             used_name = alias.asname or alias.name.split(".")[0]
             if alias.asname is None:
-                new_as = self._make_alias(used_name)
+                new_as = self._alias_for(used_name)
                 alias.asname = new_as
                 # map the original used name (top-level) -> new alias
                 self.name_map[used_name] = new_as
             else:
                 # if already has asname, still record mapping from original used_name -> asname
                 self.name_map[used_name] = alias.asname
-            # mark the alias as bound at this scope
-            self._bind_name(alias.asname)
-        return node
 
-    def visit_ImportFrom(self, node: ast.ImportFrom):
+    def _alias_import_from(self, node: ast.ImportFrom) -> None:
         # For "from pkg import a as b" -> record mapping a -> asname (or generated asname)
         for alias in node.names:
             if alias.asname is None:
-                new_as = self._make_alias(alias.name)
+                new_as = self._alias_for(alias.name)
                 alias.asname = new_as
                 self.name_map[alias.name] = new_as
             else:
                 self.name_map[alias.name] = alias.asname
-            # bind the alias in current scope
-            self._bind_name(alias.asname)
+
+    def visit_Import(self, node: ast.Import) -> ast.AST:
+        # aliases were created in phase 1; mark them as bound at this scope
+        for alias in node.names:
+            self._bind_name(cast(str, alias.asname))
+        return node
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> ast.AST:
+        for alias in node.names:
+            self._bind_name(cast(str, alias.asname))
         return node
 
     # ----------------------
     # Bindings: function/class/assign/args/etc.
     # ----------------------
-    def visit_FunctionDef(self, node: ast.FunctionDef):
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.AST:
         # function name is bound in current scope
         self._bind_name(node.name)
         # new inner scope for the function body
@@ -107,12 +190,12 @@ class ImportRenamer(ast.NodeTransformer):
         if node.args.kwarg:
             self._bind_name(node.args.kwarg.arg)
         # process decorator list and body
-        node.decorator_list = [self.visit(d) for d in node.decorator_list]
-        node.body = [self.visit(n) for n in node.body]
+        self._visit_list(node.decorator_list)
+        self._visit_list(node.body)
         self._pop_scope()
         return node
 
-    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef):
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> ast.AST:
         # same handling as FunctionDef
         self._bind_name(node.name)
         self._push_scope()
@@ -122,35 +205,33 @@ class ImportRenamer(ast.NodeTransformer):
             self._bind_name(node.args.vararg.arg)
         if node.args.kwarg:
             self._bind_name(node.args.kwarg.arg)
-        node.decorator_list = [self.visit(d) for d in node.decorator_list]
-        node.body = [self.visit(n) for n in node.body]
+        self._visit_list(node.decorator_list)
+        self._visit_list(node.body)
         self._pop_scope()
         return node
 
-    def visit_ClassDef(self, node: ast.ClassDef):
+    def visit_ClassDef(self, node: ast.ClassDef) -> ast.AST:
         # class name bound in current scope
         self._bind_name(node.name)
         # class body gets its own scope
         self._push_scope()
-        node.bases = [self.visit(b) for b in node.bases]
-        node.keywords = [self.visit(k) for k in node.keywords]
-        node.body = [self.visit(n) for n in node.body]
+        self._visit_list(node.bases)
+        self._visit_list(node.keywords)
+        self._visit_list(node.body)
         self._pop_scope()
         return node
 
-    def visit_Assign(self, node: ast.Assign):
+    def visit_Assign(self, node: ast.Assign) -> ast.AST:
         # Bind names that are assignment targets BEFORE visiting the value so they shadow replacement in body
         for target in node.targets:
-            for n in self._target_names(target):
-                self._bind_name(n)
-        node.targets = [self.visit(t) for t in node.targets]
+            self._bind_target(target)
+        self._visit_list(node.targets)
         node.value = self.visit(node.value) if node.value is not None else None
         return node
 
-    def visit_AnnAssign(self, node: ast.AnnAssign):
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> ast.AST:
         if node.target is not None:
-            for n in self._target_names(node.target):
-                self._bind_name(n)
+            self._bind_target(node.target)
         node.target = self.visit(node.target)
         node.annotation = (
             self.visit(node.annotation) if node.annotation is not None else None
@@ -158,56 +239,52 @@ class ImportRenamer(ast.NodeTransformer):
         node.value = self.visit(node.value) if node.value is not None else None
         return node
 
-    def visit_AugAssign(self, node: ast.AugAssign):
-        for n in self._target_names(node.target):
-            self._bind_name(n)
+    def visit_AugAssign(self, node: ast.AugAssign) -> ast.AST:
+        self._bind_target(node.target)
         node.target = self.visit(node.target)
         node.value = self.visit(node.value)
         return node
 
-    def visit_For(self, node: ast.For):
-        for n in self._target_names(node.target):
-            self._bind_name(n)
+    def visit_For(self, node: ast.For) -> ast.AST:
+        self._bind_target(node.target)
         node.target = self.visit(node.target)
         node.iter = self.visit(node.iter)
         self._push_scope()
-        node.body = [self.visit(n) for n in node.body]
-        node.orelse = [self.visit(n) for n in node.orelse]
+        self._visit_list(node.body)
+        self._visit_list(node.orelse)
         self._pop_scope()
         return node
 
-    def visit_With(self, node: ast.With):
+    def visit_With(self, node: ast.With) -> ast.AST:
         for item in node.items:
             if item.optional_vars is not None:
-                for n in self._target_names(item.optional_vars):
-                    self._bind_name(n)
-        node.items = [self.visit(i) for i in node.items]
+                self._bind_target(item.optional_vars)
+        self._visit_list(node.items)
         self._push_scope()
-        node.body = [self.visit(n) for n in node.body]
+        self._visit_list(node.body)
         self._pop_scope()
         return node
 
-    def visit_ListComp(self, node: ast.ListComp):
+    def visit_ListComp(self, node: ast.ListComp) -> ast.AST:
         # comprehensions have their own inner scope for targets
         self._push_scope()
-        node.generators = [self.visit(g) for g in node.generators]
+        self._visit_list(node.generators)
         node.elt = self.visit(node.elt)
         self._pop_scope()
         return node
 
-    def visit_comprehension(self, node: ast.comprehension):
-        for n in self._target_names(node.target):
-            self._bind_name(n)
+    def visit_comprehension(self, node: ast.comprehension) -> ast.AST:
+        self._bind_target(node.target)
         node.target = self.visit(node.target)
         node.iter = self.visit(node.iter)
-        node.ifs = [self.visit(i) for i in node.ifs]
+        self._visit_list(node.ifs)
         return node
 
-    def visit_arg(self, node: ast.arg):
+    def visit_arg(self, node: ast.arg) -> ast.AST:
         # args are already recorded in visit_FunctionDef, but visiting is fine
         return node
 
-    def visit_Global(self, node: ast.Global):
+    def visit_Global(self, node: ast.Global) -> ast.AST:
         # if global mentions an original import name, change it to the alias so it points to the module-level alias
         new_names = []
         for n in node.names:
@@ -218,7 +295,7 @@ class ImportRenamer(ast.NodeTransformer):
         node.names = new_names
         return node
 
-    def visit_Nonlocal(self, node: ast.Nonlocal):
+    def visit_Nonlocal(self, node: ast.Nonlocal) -> ast.AST:
         # similarly remap nonlocal declarations if they reference an original imported name
         new_names = []
         for n in node.names:
@@ -232,9 +309,9 @@ class ImportRenamer(ast.NodeTransformer):
     # ----------------------
     # Replace Name usages (loads) with alias when appropriate
     # ----------------------
-    def visit_Name(self, node: ast.Name):
+    def visit_Name(self, node: ast.Name) -> ast.AST:
         # Do not remap when this is being assigned to (Store/Del) — only for Load we try to replace.
-        if isinstance(node.ctx, ast.Load):
+        if node.ctx.__class__ is self._Load:
             orig = node.id
             if orig in self.name_map and (not self._is_bound_in_any_scope(orig)):
                 # replace
@@ -246,144 +323,97 @@ class ImportRenamer(ast.NodeTransformer):
     # ----------------------
     # Helpers
     # ----------------------
-    def _target_names(self, target) -> list[str]:
-        """Return a list of simple names bound by target (e.g. Name nodes inside tuples etc)."""
-        names = []
-        if isinstance(target, ast.Name):
-            names.append(target.id)
-        elif isinstance(target, (ast.Tuple, ast.List)):
+    def _bind_target(self, target: Any) -> None:
+        """Bind the simple names in target (e.g. Name nodes inside tuples etc) in the current scope."""
+        cls = target.__class__
+        if cls is self._Name:
+            self._bind_name(target.id)
+        elif cls is self._Tuple or cls is self._List:
             for elt in target.elts:
-                names.extend(self._target_names(elt))
-        elif isinstance(target, ast.Attribute):
-            # attribute assignment (obj.attr) does not bind a local name
-            pass
-        elif isinstance(target, ast.Subscript):
-            # subscript assignment does not bind new name
-            pass
-        else:
-            # other cases: ignore
-            pass
-        return names
+                self._bind_target(elt)
+        # attribute/subscript assignment does not bind a local name
 
 
-class StringToHexTransformer(ast.NodeTransformer):
+def _is_docstring(stmt: ast.stmt) -> bool:
+    return (
+        isinstance(stmt, ast.Expr)
+        and isinstance(stmt.value, ast.Constant)
+        and isinstance(stmt.value.value, str)
+    )
+
+
+class StringToHexTransformer(_DispatchTransformer):
     """
-    Replace string literals with ''.join([chr(int("<hex>"[i:i+2], 16)) for i in range(0, len("<hex>"), 2)]).
+    Replace string literals with bytes.fromhex("<hex>").decode("utf-8").
+    With `as_bytes=True` they become b"<utf-8>".decode("utf-8") instead: the bytes are
+    decoded by the compiler, so nothing is left to do at runtime, but ASCII text stays
+    readable in the output.
     Keeps docstrings and f-strings safe.
     """
 
-    def __init__(self, skip_docstrings=True, skip_fstrings=True):
-        self.skip_docstrings = skip_docstrings
-        self.skip_fstrings = skip_fstrings
-
-    def _string_to_expr(self, s: str) -> ast.AST:
-        # Convert to hex
-        hexstr = binascii.hexlify(s.encode("utf-8")).decode("UTF-8")
-
-        # Build comprehension:
-        # ''.join([chr(int("<hex>"[i:i+2], 16)) for i in range(0, len("<hex>"), 2)])
-        # Step-by-step AST build:
-
-        # range(0, len("<hex>"), 2)
-        range_call = ast.Call(
-            func=ast.Name(id="range", ctx=ast.Load()),
-            args=[
-                ast.Constant(value=0),
-                ast.Call(
-                    func=ast.Name(id="len", ctx=ast.Load()),
-                    args=[ast.Constant(value=hexstr)],
-                    keywords=[],
-                ),
-                ast.Constant(value=2),
-            ],
-            keywords=[],
-        )
-
-        # chr(int("<hex>"[i:i+2], 16))
-        slice_expr = ast.Subscript(
-            value=ast.Constant(value=hexstr),
-            slice=ast.Slice(
-                lower=ast.Name(id="i", ctx=ast.Load()),
-                upper=ast.BinOp(
-                    left=ast.Name(id="i", ctx=ast.Load()),
-                    op=ast.Add(),
-                    right=ast.Constant(value=2),
-                ),
-            ),
-            ctx=ast.Load(),
-        )
-        int_call = ast.Call(
-            func=ast.Name(id="int", ctx=ast.Load()),
-            args=[slice_expr, ast.Constant(value=16)],
-            keywords=[],
-        )
-        chr_call = ast.Call(
-            func=ast.Name(id="chr", ctx=ast.Load()), args=[int_call], keywords=[]
+    def __init__(
+        self,
+        skip_docstrings: bool = True,
+        skip_fstrings: bool = True,
+        as_bytes: bool = False,
+    ) -> None:
+        super().__init__()
+        self.skip_docstrings: bool = skip_docstrings
+        self.skip_fstrings: bool = skip_fstrings
+        self.as_bytes: bool = as_bytes
+        # nodes shared by every expansion (the transformer never mutates them)
+        self._fromhex = ast.Attribute(
+            value=ast.Name(id="bytes", ctx=ast.Load()), attr="fromhex", ctx=ast.Load()
         )
+        self._utf8 = ast.Constant(value="utf-8")
 
-        # List comprehension: [chr(int(...)) for i in range(...)]
-        comp = ast.ListComp(
-            elt=chr_call,
-            generators=[
-                ast.comprehension(
-                    target=ast.Name(id="i", ctx=ast.Store()),
-                    iter=range_call,
-                    ifs=[],
-                    is_async=0,
-                )
-            ],
-        )
+    def _string_to_expr(self, s: str) -> ast.AST:
+        # nothing to hide in empty / single-character strings
+        if len(s) <= 1:
+            return ast.Constant(value=s)
 
-        # ''.join([...])
-        join_call = ast.Call(
-            func=ast.Attribute(
-                value=ast.Constant(value=""), attr="join", ctx=ast.Load()
-            ),
-            args=[comp],
+        if self.as_bytes:
+            encoded: ast.expr = ast.Constant(value=s.encode("utf-8"))
+        else:
+            # bytes.fromhex("<hex>"): decoded in one C call at runtime instead of a
+            # Python-level chr/int loop per character
+            encoded = ast.Call(
+                func=self._fromhex,
+                args=[ast.Constant(value=s.encode("utf-8").hex())],
+                keywords=[],
+            )
+        return ast.Call(
+            func=ast.Attribute(value=encoded, attr="decode", ctx=ast.Load()),
+            args=[self._utf8],
             keywords=[],
         )
 
-        return join_call
-
-    def _transform_body(self, body):
-        if not body:
-            return body
-        new_body = []
-        for idx, stmt in enumerate(body):
-            if (
-                idx == 0
-                and self.skip_docstrings
-                and isinstance(stmt, ast.Expr)
-                and isinstance(stmt.value, ast.Constant)
-                and isinstance(stmt.value.value, str)
-            ):
-                new_body.append(stmt)
-                continue
-            new_body.append(self.visit(stmt))
-        return new_body
+    def _transform_body(self, body: list[ast.stmt]) -> None:
+        skip = bool(body) and self.skip_docstrings and _is_docstring(body[0])
+        self._visit_list(body, 1 if skip else 0)
 
-    def visit_Module(self, node):
-        node.body = self._transform_body(node.body)
+    def visit_Module(self, node: ast.Module) -> ast.AST:
+        self._transform_body(node.body)
         return node
 
-    def visit_FunctionDef(self, node):
-        node.body = self._transform_body(node.body)
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.AST:
+        self._transform_body(node.body)
         return node
 
-    def visit_AsyncFunctionDef(self, node):
-        node.body = self._transform_body(node.body)
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> ast.AST:
+        self._transform_body(node.body)
         return node
 
-    def visit_ClassDef(self, node):
-        node.body = self._transform_body(node.body)
+    def visit_ClassDef(self, node: ast.ClassDef) -> ast.AST:
+        self._transform_body(node.body)
         return node
 
-    def visit_JoinedStr(self, node):
+    def visit_JoinedStr(self, node: ast.JoinedStr) -> ast.AST:
         if self.skip_fstrings:
             return node
         return node
 
-    def visit_Constant(self, node):
+    def visit_Constant(self, node: ast.Constant) -> ast.AST:
         if isinstance(node.value, str):
             new_node = self._string_to_expr(node.value)
             ast.copy_location(new_node, node)
@@ -391,11 +421,28 @@ class StringToHexTransformer(ast.NodeTransformer):
         return node
 
 
-def gen_random_name(n=8):
-    return "n" + "".join(random.choices(string.digits + string.ascii_letters, k=n))
+class _NamePool:
+    """
+    Random identifiers handed out from a pre-generated batch: one randbytes call per
+    4096 names instead of a random.choices + join per binding.
+    """
+
+    _BATCH = 4096
+    _NAME_BYTES = 6  # "n" + 12 hex chars, about as much entropy as 8 alphanumerics
 
+    def __init__(self, rng: random.Random) -> None:
+        self._rng = rng
+        self._buf: list[str] = []
 
-class Renamer(ast.NodeTransformer):
+    def get(self) -> str:
+        if not self._buf:
+            n = self._NAME_BYTES
+            raw = self._rng.randbytes(n * self._BATCH).hex()
+            self._buf = ["n" + raw[i : i + 2 * n] for i in range(0, len(raw), 2 * n)]
+        return self._buf.pop()
+
+
+class Renamer(_DispatchTransformer):
     """
     Per-binding obfuscation:
       - each binding (assign target, arg, comprehension target, def/class name, import asname) gets a fresh random name
@@ -403,43 +450,63 @@ class Renamer(ast.NodeTransformer):
     Correctly handles comprehensions/generator expressions to avoid target/use mismatches.
     """
 
-    def __init__(self, seed=None):
-        self.scopes = []  # list of dicts mapping original -> obfuscated in each scope
-        if seed is not None:
-            random.seed(seed)
+    def __init__(self, seed: int | None = None) -> None:
+        super().__init__()
+        # originals bound in all open scopes in one flat list; each scope is the slice
+        # starting at its entry in _scope_starts
+        self._arena: list[str] = []
+        self._scope_starts: list[int] = []
+        # original -> (scope depth, obfuscated name) from outer to inner scope, so the
+        # innermost binding is always at [-1]
+        self._bindings: dict[str, list[tuple[int, str]]] = {}
+        # bound once here instead of per call in the hot visitors
+        self._bind: Callable[[str], str] = self.bind_name
+        self._lookup: Callable[[str], str | None] = self.lookup
+        self._pool = _NamePool(random.Random(seed))
 
     # scope helpers
-    def push_scope(self):
-        self.scopes.append({})
-
-    def pop_scope(self):
-        self.scopes.pop()
-
-    def bind_name(self, orig):
+    def push_scope(self) -> None:
+        self._scope_starts.append(len(self._arena))
+
+    def pop_scope(self) -> None:
+        start = self._scope_starts.pop()
+        for orig in self._arena[start:]:
+            stack = self._bindings[orig]
+            stack.pop()
+            if not stack:
+                del self._bindings[orig]
+        del self._arena[start:]
+
+    def bind_name(self, orig: str) -> str:
         # create mapping in current scope for this binding
-        if not self.scopes:
+        if not self._scope_starts:
             self.push_scope()
-        mapping = self.scopes[-1]
-        if orig not in mapping:
-            mapping[orig] = gen_random_name()
-        return mapping[orig]
-
-    def lookup(self, orig):
-        # find nearest mapping for orig, from inner->outer
-        for m in reversed(self.scopes):
-            if orig in m:
-                return m[orig]
-        return None
+        depth = len(self._scope_starts)
+        stack = self._bindings.setdefault(orig, [])
+        if not stack or stack[-1][0] != depth:
+            stack.append((depth, self._pool.get()))
+            self._arena.append(orig)
+        return stack[-1][1]
+
+    def lookup(self, orig: str) -> str | None:
+        # nearest mapping for orig, from inner->outer
+        stack = self._bindings.get(orig)
+        return stack[-1][1] if stack else None
 
     # --- Module / top-level ---
-    def visit_Module(self, node):
+    def _visit_body(self, body: list[ast.stmt]) -> None:
+        self._visit_list(body)
+
+    def visit_Module(self, node: ast.Module) -> ast.AST:
         self.push_scope()
-        self.generic_visit(node)
+        self._visit_body(node.body)
         self.pop_scope()
         return node
 
     # --- Function / Class definitions ---
-    def visit_FunctionDef(self, node):
+    def visit_FunctionDef(
+        self, node: ast.FunctionDef | ast.AsyncFunctionDef
+    ) -> ast.AST:
         # function name bound in current (enclosing) scope
         obf_name = self.bind_name(node.name)
         node.name = obf_name
@@ -448,186 +515,146 @@ class Renamer(ast.NodeTransformer):
         self.push_scope()
         # bind args
         for a in node.args.posonlyargs + node.args.args + node.args.kwonlyargs:
-            self.bind_name(a.arg)
-            a.arg = self.lookup(a.arg)
+            a.arg = self._bind(a.arg)
         if node.args.vararg:
-            self.bind_name(node.args.vararg.arg)
-            node.args.vararg.arg = self.lookup(node.args.vararg.arg)
+            node.args.vararg.arg = self._bind(node.args.vararg.arg)
         if node.args.kwarg:
-            self.bind_name(node.args.kwarg.arg)
-            node.args.kwarg.arg = self.lookup(node.args.kwarg.arg)
+            node.args.kwarg.arg = self._bind(node.args.kwarg.arg)
 
         # decorators, returns, body
-        node.decorator_list = [self.visit(d) for d in node.decorator_list]
+        self._visit_list(node.decorator_list)
         if node.returns:
             node.returns = self.visit(node.returns)
-        node.body = [self.visit(n) for n in node.body]
+        self._visit_body(node.body)
 
         self.pop_scope()
         return node
 
-    def visit_AsyncFunctionDef(self, node):
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> ast.AST:
         return self.visit_FunctionDef(node)
 
-    def visit_ClassDef(self, node):
+    def visit_ClassDef(self, node: ast.ClassDef) -> ast.AST:
         obf_name = self.bind_name(node.name)
         node.name = obf_name
         self.push_scope()
-        node.bases = [self.visit(b) for b in node.bases]
-        node.keywords = [self.visit(k) for k in node.keywords]
-        node.body = [self.visit(n) for n in node.body]
+        self._visit_list(node.bases)
+        self._visit_list(node.keywords)
+        self._visit_body(node.body)
         self.pop_scope()
         return node
 
     # --- Lambdas ---
-    def visit_Lambda(self, node):
+    def visit_Lambda(self, node: ast.Lambda) -> ast.AST:
         # lambdas have their own tiny scope
         self.push_scope()
         for a in node.args.posonlyargs + node.args.args + node.args.kwonlyargs:
-            self.bind_name(a.arg)
-            a.arg = self.lookup(a.arg)
+            a.arg = self._bind(a.arg)
         if node.args.vararg:
-            self.bind_name(node.args.vararg.arg)
-            node.args.vararg.arg = self.lookup(node.args.vararg.arg)
+            node.args.vararg.arg = self._bind(node.args.vararg.arg)
         if node.args.kwarg:
-            self.bind_name(node.args.kwarg.arg)
-            node.args.kwarg.arg = self.lookup(node.args.kwarg.arg)
+            node.args.kwarg.arg = self._bind(node.args.kwarg.arg)
         node.body = self.visit(node.body)
         self.pop_scope()
         return node
 
     # --- Assignments & target binding ---
-    def _collect_target_names(self, target):
-        """Return simple names bound by a target (Name nodes inside tuple/list etc.)."""
-        names = []
-        if isinstance(target, ast.Name):
-            names.append(target.id)
-        elif isinstance(target, (ast.Tuple, ast.List)):
+    def _bind_and_rename_target(self, target: Any) -> None:
+        """Bind the simple names in a target and rename them in-place, in one walk."""
+        cls = target.__class__
+        if cls is self._Name:
+            target.id = self._bind(target.id)
+        elif cls is self._Tuple or cls is self._List:
             for elt in target.elts:
-                names.extend(self._collect_target_names(elt))
+                self._bind_and_rename_target(elt)
         # attributes/subscripts don't bind new local names
-        return names
-
-    def _apply_target_renames(self, target):
-        """Apply renames in-place for a target that's already been bind_name'd."""
-        if isinstance(target, ast.Name):
-            new = self.lookup(target.id)
-            if new:
-                target.id = new
-        elif isinstance(target, (ast.Tuple, ast.List)):
-            for elt in target.elts:
-                self._apply_target_renames(elt)
 
-    def visit_Assign(self, node):
+    def visit_Assign(self, node: ast.Assign) -> ast.AST:
         # Bind targets first so they shadow inside value if necessary
         for t in node.targets:
-            for n in self._collect_target_names(t):
-                self.bind_name(n)
-        # Now apply renames to targets and visit them
-        node.targets = [self.visit(t) for t in node.targets]
-        for t in node.targets:
-            self._apply_target_renames(t)
+            self._bind_and_rename_target(t)
+        self._visit_list(node.targets)
         node.value = self.visit(node.value) if node.value is not None else None
         return node
 
-    def visit_AnnAssign(self, node):
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> ast.AST:
         if node.target is not None:
-            for n in self._collect_target_names(node.target):
-                self.bind_name(n)
+            self._bind_and_rename_target(node.target)
         node.target = self.visit(node.target)
-        if isinstance(node.target, (ast.Tuple, ast.List)) or isinstance(
-            node.target, ast.Name
-        ):
-            self._apply_target_renames(node.target)
-        node.annotation = self.visit(node.annotation) if node.annotation else None
+        node.annotation = self.visit(node.annotation)
         node.value = self.visit(node.value) if node.value else None
         return node
 
-    def visit_AugAssign(self, node):
-        for n in self._collect_target_names(node.target):
-            self.bind_name(n)
+    def visit_AugAssign(self, node: ast.AugAssign) -> ast.AST:
+        self._bind_and_rename_target(node.target)
         node.target = self.visit(node.target)
-        self._apply_target_renames(node.target)
         node.value = self.visit(node.value)
         return node
 
     # --- For / With targets ---
-    def visit_For(self, node):
+    def visit_For(self, node: ast.For) -> ast.AST:
         # visit iter first (target is not bound for iter)
         node.iter = self.visit(node.iter)
-        # bind target names then apply rename
-        for n in self._collect_target_names(node.target):
-            self.bind_name(n)
+        # bind target names and rename them
+        self._bind_and_rename_target(node.target)
         node.target = self.visit(node.target)
-        self._apply_target_renames(node.target)
-        # body has a new nested scope (but typical Python keeps same scope for for-body; we do push for safety)
-        self.push_scope()
-        node.body = [self.visit(n) for n in node.body]
-        node.orelse = [self.visit(n) for n in node.orelse]
-        self.pop_scope()
+        # the body shares the enclosing scope: names assigned in a loop are still
+        # bound after it, so they must keep the same obfuscated name
+        self._visit_list(node.body)
+        self._visit_list(node.orelse)
         return node
 
-    def visit_With(self, node):
+    def visit_With(self, node: ast.With) -> ast.AST:
         for item in node.items:
             if item.optional_vars is not None:
-                for n in self._collect_target_names(item.optional_vars):
-                    self.bind_name(n)
-        node.items = [self.visit(i) for i in node.items]
-        self.push_scope()
-        node.body = [self.visit(n) for n in node.body]
-        self.pop_scope()
+                self._bind_and_rename_target(item.optional_vars)
+        self._visit_list(node.items)
+        self._visit_list(node.body)
         return node
 
     # --- Comprehensions & generator expressions ---
-    def visit_comprehension(self, node):
+    def visit_comprehension(self, node: ast.comprehension) -> ast.AST:
         # Visit iter BEFORE binding the comprehension target(s)
         node.iter = self.visit(node.iter)
 
         # Create new inner scope for the comprehension level and bind the target names
         # Note: we use the push/pop done in the surrounding ListComp/GeneratorExp visitors
-        target_names = self._collect_target_names(node.target)
-        for n in target_names:
-            self.bind_name(n)
-        # Now apply the rename to the AST target node
-        self._apply_target_renames(node.target)
+        self._bind_and_rename_target(node.target)
 
         # Now visit any ifs (they see the target bound)
-        node.ifs = [self.visit(i) for i in node.ifs]
+        self._visit_list(node.ifs)
         return node
 
-    def visit_ListComp(self, node):
+    def visit_ListComp(self, node: ast.ListComp) -> ast.AST:
         self.push_scope()
-        node.generators = [
-            self.visit(g) for g in node.generators
-        ]  # visit_comprehension handles binding
+        self._visit_list(node.generators)  # visit_comprehension handles binding
         node.elt = self.visit(node.elt)
         self.pop_scope()
         return node
 
-    def visit_GeneratorExp(self, node):
+    def visit_GeneratorExp(self, node: ast.GeneratorExp) -> ast.AST:
         self.push_scope()
-        node.generators = [self.visit(g) for g in node.generators]
+        self._visit_list(node.generators)
         node.elt = self.visit(node.elt)
         self.pop_scope()
         return node
 
-    def visit_SetComp(self, node):
+    def visit_SetComp(self, node: ast.SetComp) -> ast.AST:
         self.push_scope()
-        node.generators = [self.visit(g) for g in node.generators]
+        self._visit_list(node.generators)
         node.elt = self.visit(node.elt)
         self.pop_scope()
         return node
 
-    def visit_DictComp(self, node):
+    def visit_DictComp(self, node: ast.DictComp) -> ast.AST:
         self.push_scope()
-        node.generators = [self.visit(g) for g in node.generators]
+        self._visit_list(node.generators)
         node.key = self.visit(node.key)
         node.value = self.visit(node.value)
         self.pop_scope()
         return node
 
     # --- Imports: bind the asname (or generate one) ---
-    def visit_Import(self, node):
+    def visit_Import(self, node: ast.Import) -> ast.AST:
         for alias in node.names:
             used_name = alias.asname or alias.name.split(".")[0]
             if alias.asname is None:
@@ -638,7 +665,7 @@ class Renamer(ast.NodeTransformer):
                 self.bind_name(alias.asname)
         return node
 
-    def visit_ImportFrom(self, node):
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> ast.AST:
         for alias in node.names:
             used_name = alias.asname or alias.name
             if alias.asname is None:
@@ -649,35 +676,94 @@ class Renamer(ast.NodeTransformer):
         return node
 
     # --- Name usage replacement ---
-    def visit_Name(self, node):
-        if isinstance(node.ctx, ast.Load):
-            mapped = self.lookup(node.id)
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.ctx.__class__ is self._Load:
+            mapped = self._lookup(node.id)
             if mapped:
                 return ast.copy_location(ast.Name(id=mapped, ctx=node.ctx), node)
         return node
 
     # generic visit fallback
-    def generic_visit(self, node):
+    def generic_visit(self, node: ast.AST) -> ast.AST:
         return super().generic_visit(node)
 
 
-src = ""
+class FusedTransformer(Renamer):
+    """
+    Renamer and StringToHexTransformer applied in a single walk over the tree.
+    Renamer already binds every import to a fresh alias, which is all ImportRenamer would add
+    on top of it, so a separate import pass is not needed.
+    f-strings keep their literal parts (names inside them are still renamed).
+    """
+
+    def __init__(
+        self,
+        seed: int | None = None,
+        skip_docstrings: bool = True,
+        as_bytes: bool = False,
+    ) -> None:
+        super().__init__(seed)
+        self.hex: StringToHexTransformer = StringToHexTransformer(
+            skip_docstrings=skip_docstrings, as_bytes=as_bytes
+        )
+        self._fstring_depth: int = 0
+
+    def _visit_body(self, body: list[ast.stmt]) -> None:
+        skip = bool(body) and self.hex.skip_docstrings and _is_docstring(body[0])
+        self._visit_list(body, 1 if skip else 0)
+
+    def visit_JoinedStr(self, node: ast.JoinedStr) -> ast.AST:
+        self._fstring_depth += 1
+        self.generic_visit(node)
+        self._fstring_depth -= 1
+        return node
+
+    def visit_Constant(self, node: ast.Constant) -> ast.AST:
+        if self._fstring_depth:
+            return node
+        return self.hex.visit_Constant(node)
+
+
+_AST_CACHE_DIR = os.path.expanduser("~/.cache/obfuscator")
+
+
+def _pickled_ast(path: str, mtime: float) -> bytes:
+    # on-disk cache of the parsed tree, valid as long as it is newer than the source;
+    # the ast classes differ between Python versions, so the cache_tag (e.g.
+    # "cpython-312", as in __pycache__) is part of the name
+    name = hashlib.sha1(path.encode("utf8")).hexdigest()
+    cache_path = os.path.join(
+        _AST_CACHE_DIR, f"{name}.{sys.implementation.cache_tag}.pkl"
+    )
+    try:
+        if os.path.getmtime(cache_path) >= mtime:
+            with open(cache_path, "rb") as f:
+                return f.read()
+    except OSError:
+        pass
+
+    with open(path, "r") as f:
+        data = pickle.dumps(ast.parse(f.read()), pickle.HIGHEST_PROTOCOL)
+    try:
+        os.makedirs(_AST_CACHE_DIR, exist_ok=True)
+        with open(cache_path, "wb") as f:
+            f.write(data)
+    except OSError:
+        pass
+    return data
+
 
-with open("password_game.py", "r") as f:
-    src = f.read()
+def load_ast(path: str) -> ast.Module:
+    """Parse `path`, reusing a cached tree while the file's mtime is unchanged."""
+    path = os.path.abspath(path)
+    return pickle.loads(_pickled_ast(path, os.path.getmtime(path)))
 
-tree = ast.parse(src)
-renamer = Renamer()
-new_tree = renamer.visit(tree)
-ast.fix_missing_locations(new_tree)
-tr = StringToHexTransformer()
-new = tr.visit(tree)
-ast.fix_missing_locations(new)
-three = ImportRenamer()
-new_three = three.visit(tree)
-ast.fix_missing_locations(new_three)
 
+tree = load_ast("password_game.py")
+new = FusedTransformer().visit(tree)
 
+# python_minifier only accepts source and parses it itself, so the tree is unparsed
+# exactly once; ast.unparse ignores positions, so no fix_missing_locations pass either
 minified = python_minifier.minify(
     ast.unparse(new),
     remove_literal_statements=True,
@@ -1,84 +1,97 @@
-import matplotlib.pyplot as plt
-import matplotlib.ticker as plticker
-from PIL import Image, ImageDraw
+import io
+import numpy as np
+import threading
+from functools import cache
+from PIL import Image, ImageDraw, ImageFont
 from typing import IO
-import easyocr
 
 
-def split_image(path_or_bytes: str | IO[bytes], num_squares: tuple[int, int] = (10, 8)):
-    image = Image.open(path_or_bytes)
-    dpi = 300
+def split_image(
+    path_or_bytes: str | IO[bytes], num_squares: tuple[int, int] = (10, 8)
+) -> Image.Image:
+    """Returns the image with a numbered `nx` x `ny` grid drawn over it."""
+    # drawn straight onto a copy of the image with PIL; the sizes below are what the
+    # old 300 dpi matplotlib figure produced (0.8pt grid lines, 5pt labels)
+    out = Image.open(path_or_bytes).convert("RGB")
+    draw = ImageDraw.Draw(out)
+    font = ImageFont.load_default(size=21)
 
     nx, ny = num_squares
 
-    fig = plt.figure(
-        figsize=(float(image.size[0]) / dpi, float(image.size[1]) / dpi),
-        dpi=dpi,
-    )
-    ax = fig.add_subplot(111)
-
-    fig.subplots_adjust(left=0, right=1, bottom=0, top=1)
-
-    width, height = image.size
+    width, height = out.size
     xInterval = width / nx
     yInterval = height / ny
 
-    ax.xaxis.set_major_locator(plticker.MultipleLocator(base=xInterval))
-    ax.yaxis.set_major_locator(plticker.MultipleLocator(base=yInterval))
-
-    ax.grid(which="major", axis="both", linestyle="-")
-
-    ax.imshow(image)
+    for i in range(1, nx):
+        x = round(i * xInterval)
+        draw.line([(x, 0), (x, height)], fill="#b0b0b0", width=3)
+    for j in range(1, ny):
+        y = round(j * yInterval)
+        draw.line([(0, y), (width, y)], fill="#b0b0b0", width=3)
 
     for j in range(ny):
         y = yInterval / 2 + j * yInterval
         for i in range(nx):
             x = xInterval / 2 + i * xInterval
-            ax.text(
-                x,
-                y,
-                "{:d}".format(i + j * nx),
-                color="w",
-                ha="center",
-                va="center",
-                fontsize=5,
+            draw.text(
+                (x, y), "{:d}".format(i + j * nx), fill="white", anchor="mm", font=font
             )
 
-    # Save the figure
-    fig.savefig("OIP2.webp", dpi=dpi)
+    out.save("OIP2.webp", quality=90)
+    return out
+
+
+_reader_lock = threading.Lock()
+
 
-def ocr(path_or_bytes: str | IO[bytes]):
-    reader = easyocr.Reader(["en"], gpu=True)
+@cache
+def _load_reader():
+    # easyocr pulls in torch, and building a Reader loads both models onto the GPU,
+    # which costs far more than reading one image; do it once, on first use
+    import easyocr
 
-    result = reader.readtext(path_or_bytes)
+    return easyocr.Reader(["en"], gpu=True)
 
-    def box_to_polygon(box):
-        """Return list of tuples [(x,y), ...] as ints for PIL polygon drawing"""
-        return [(int(p[0]), int(p[1])) for p in box]
 
-    img = Image.open(path_or_bytes).convert("RGBA")
-    overlay = Image.new("RGBA", img.size, (255, 255, 255, 0))
-    draw = ImageDraw.Draw(overlay)
+def _reader():
+    # ocr runs in worker threads, and `cache` has no lock of its own: without one
+    # two first calls at once would each load the models
+    with _reader_lock:
+        return _load_reader()
 
-    box_color = (0, 200, 0, 255)
+
+def ocr(path_or_bytes: str | IO[bytes]) -> tuple[list[str], Image.Image]:
+    """Returns the recognized text and the image with the detected boxes drawn on it."""
+    if isinstance(path_or_bytes, str):
+        with open(path_or_bytes, "rb") as f:
+            data = f.read()
+    else:
+        data = path_or_bytes.read()
+
+    # read the file once; easyocr and PIL both decode from the same bytes
+    result = _reader().readtext(data)
+
+    # the boxes are opaque, so they are drawn straight onto the RGB image rather than
+    # onto an RGBA overlay that has to be composited back
+    boxed = Image.open(io.BytesIO(data)).convert("RGB")
+    draw = ImageDraw.Draw(boxed)
+
+    box_color = (0, 200, 0)
     line_width = 2
 
     out = []
-    for det in result:
-        box, text, _ = det
-        poly = box_to_polygon(box)
-
-        draw.line(poly + [poly[0]], fill=box_color, width=line_width)
+    for box, text, _ in result:
+        # corners as ints, then back to the first corner to close the outline
+        poly = np.asarray(box, dtype=np.int32)
+        draw.line(
+            np.vstack((poly, poly[:1])).ravel().tolist(),
+            fill=box_color,
+            width=line_width,
+        )
         out.append(text)
 
-    result = Image.alpha_composite(img, overlay).convert("RGB")
-
     # Save result
-    result.save("image_with_boxes.jpg", quality=100)
+    boxed.save("image_with_boxes.jpg", quality=100)
 
-    # Show with matplotlib
-    plt.figure(figsize=(10, 8))
-    plt.imshow(result)
-    plt.axis("off")
-    plt.tight_layout()
-    return out
+    # returned as-is instead of re-rendered through a matplotlib figure
+    return out, boxed
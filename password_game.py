@@ -1,73 +1,141 @@
+import ast
+import re
+from functools import lru_cache
+from typing import Callable
 from prompt_toolkit import prompt
 from random import choices
 from string import ascii_letters
 
 zeichenfolge: str = "".join(choices([*ascii_letters, *[str(i) for i in range(9)]], k=5))
 
+_MONATE = [
+    "Januar",
+    "Februar",
+    "März",
+    "April",
+    "Mai",
+    "Juni",
+    "Juli",
+    "August",
+    "September",
+    "Oktober",
+    "November",
+    "Dezember",
+]
+# one alternation scans the password once instead of one `in` per word
+_MONTHS_RE = re.compile("|".join(map(re.escape, _MONATE)))
+_SPONSORS_RE = re.compile("Pepse|Stabux|Schel")
+
+
+@lru_cache(maxsize=1)
+def _scan(s: str) -> tuple[bool, bool, bool, int]:
+    # the digit/upper/special/sum rules are checked back to back on the same
+    # password, so walk it once and let each rule read its own field
+    has_digit = has_upper = has_special = False
+    digit_sum = 0
+    for ch in s:
+        if ch.isdigit():
+            has_digit = True
+        if ch.isupper():
+            has_upper = True
+        if not ch.isalnum() and not ch.isspace():
+            has_special = True
+        if ch.isnumeric():
+            digit_sum += int(ch)
+    return has_digit, has_upper, has_special, digit_sum
+
+
+# each rule is a Python expression over the password `s`; they are compiled together
+# into one straight-line function below instead of being called as separate lambdas
 regeln = [
-    (lambda x: len(x) >= 5, "Dein Passwort muss länger als 5 Zeichen lang sein."),
-    (
-        lambda s: any(ch.isdigit() for ch in s),
-        "Dein Passwort muss eine Zahl enthalten.",
-    ),
-    (
-        lambda s: any(ch.isupper() for ch in s),
-        "Dein Passwort muss ein Großbuchstaben enthalten.",
-    ),
+    ("len(s) >= 5", "Dein Passwort muss länger als 5 Zeichen lang sein."),
+    ("_scan(s)[0]", "Dein Passwort muss eine Zahl enthalten."),
+    ("_scan(s)[1]", "Dein Passwort muss ein Großbuchstaben enthalten."),
+    ("_scan(s)[2]", "Dein Passwort muss ein Sonderzeichen enthalten."),
+    ("_scan(s)[3] == 25", "Die Summe aller Zahlen in deinem Passwort muss 25 ergeben."),
     (
-        lambda s: any(not ch.isalnum() and not ch.isspace() for ch in s),
-        "Dein Passwort muss ein Sonderzeichen enthalten.",
-    ),
-    (
-        lambda s: sum(int(i) if i.isnumeric() else 0 for i in s) == 25,
-        "Die Summe aller Zahlen in deinem Passwort muss 25 ergeben.",
-    ),
-    (
-        lambda s: any(
-            value in s
-            for value in [
-                "Januar",
-                "Februar",
-                "März",
-                "April",
-                "Mai",
-                "Juni",
-                "Juli",
-                "August",
-                "September",
-                "Oktober",
-                "November",
-                "Dezember",
-            ]
-        ),
+        "_MONTHS_RE.search(s) is not None",
         "Dein Passwort muss einen Monat enthalten.",
     ),
     (
-        lambda s: any(value in s for value in ["Pepse", "Stabux", "Schel"]),
+        "_SPONSORS_RE.search(s) is not None",
         "Dein Passwort muss einen unserer Sponsoren enthalten (`Pepse`, `Stabux`, `Schel`)",
     ),
     (
-        lambda s: zeichenfolge in s,
+        "zeichenfolge in s",
         f"Dein Passwort muss diese Kombi an Zeichen enthalten: `{zeichenfolge}`",
     ),
 ]
 # lambda s: any(not ch.isalnum() and not ch.isspace() for ch in s)
 
+# the names the rule expressions may use (keyed by name, so this still holds when
+# the module's own identifiers are renamed)
+_REGEL_NAMEN = {
+    "_scan": _scan,
+    "_MONTHS_RE": _MONTHS_RE,
+    "_SPONSORS_RE": _SPONSORS_RE,
+    "zeichenfolge": zeichenfolge,
+}
+
+
+def _compile_check(regeln: list[tuple[str, str]]) -> Callable[[str], int]:
+    # def check(s):
+    #     if not (<regel 0>): return 0
+    #     ...
+    #     return len(regeln)
+    body: list[ast.stmt] = [
+        ast.If(
+            test=ast.UnaryOp(op=ast.Not(), operand=ast.parse(regel, mode="eval").body),
+            body=[ast.Return(value=ast.Constant(value=index))],
+            orelse=[],
+        )
+        for index, (regel, _) in enumerate(regeln)
+    ]
+    body.append(ast.Return(value=ast.Constant(value=len(regeln))))
+
+    check = ast.FunctionDef(
+        name="check",
+        args=ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(arg="s")],
+            kwonlyargs=[],
+            kw_defaults=[],
+            defaults=[],
+        ),
+        body=body,
+        decorator_list=[],
+        type_params=[],
+    )
+    module = ast.fix_missing_locations(ast.Module(body=[check], type_ignores=[]))
+
+    namespace = dict(_REGEL_NAMEN)
+    exec(compile(module, "<regeln>", "exec"), namespace)
+    return namespace["check"]
+
+
+# index of the first rule a password breaks (len(regeln) if none); the loop asks
+# about the same password several times per round, so only a new one is re-checked
+_first_failing = lru_cache(maxsize=1)(_compile_check(regeln))
+
+
 i = 0
 letzes_passwort: str = ""
 
 while i < len(regeln):
     print("\033[H\033[2J", end="")
 
-    for r in regeln[:i]:
-        if not r[0](letzes_passwort):
-            print("\033[H\033[2J", end="")
-            print(f"{r[1]}")
-            passwort = prompt("Passwort Eingeben: ", default=letzes_passwort)
-            letzes_passwort = passwort
-            break
+    fehler = _first_failing(letzes_passwort)
+    if fehler < i:
+        # a rule that was already met is broken again
+        print("\033[H\033[2J", end="")
+        print(f"{regeln[fehler][1]}")
+        passwort = prompt("Passwort Eingeben: ", default=letzes_passwort)
+        letzes_passwort = passwort
+        fehler = _first_failing(letzes_passwort)
+        if fehler < i:
+            continue
 
-    if regeln[i][0](letzes_passwort):
+    if fehler > i:
         i += 1
         continue
 
@@ -78,7 +146,7 @@ while i < len(regeln):
     letzes_passwort = passwort
 
     if passwort != "":
-        if regeln[i][0](passwort):
+        if _first_failing(passwort) > i:
             i += 1
 
 print("ws in den chat")
@@ -1,7 +1,13 @@
+import atexit
 import dotenv
 import os
+import requests
 
-from tavily import TavilyClient
+from requests.adapters import HTTPAdapter
+from tavily import TavilyClient, TavilyError
+from tavily import TimeoutError as TavilyTimeoutError
+from ttl_cache import TTLCache
+from urllib3.util import Retry
 
 from typing import Literal, Optional, Any
 
@@ -12,9 +18,13 @@ from typing import Annotated
 
 from pydantic import StringConstraints
 
+# kept as a string: pydantic compiles it once per schema with its Rust regex
+# engine, while a precompiled re.Pattern would switch to the slower `re` one
+_DATE_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])$"
+
 Date = Annotated[
     str,
-    StringConstraints(pattern=r"^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])$"),
+    StringConstraints(pattern=_DATE_PATTERN),
     "Date in a YYYY-MM-DD format.",
 ]
 
@@ -31,6 +41,46 @@ api_key = os.getenv("TAVILY_API_KEY")
 tavily_client = TavilyClient(api_key=api_key)
 
 
+# the SDK opens a new connection (and TLS handshake) for every request, so its
+# requests are sent from here over one keep-alive session instead
+_session = requests.Session()
+_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=10,
+        max_retries=Retry(total=3, backoff_factor=0.2),
+    ),
+)
+atexit.register(_session.close)
+
+# identical searches within a few minutes return the same results, and pages change
+# even more slowly, so repeated calls are answered without a round trip
+_search_cache = TTLCache(maxsize=512, ttl=600)
+_visit_cache = TTLCache(maxsize=256, ttl=3600)
+
+
+def _post(endpoint: str, data: dict[str, Any]) -> dict[str, Any]:
+    """Send `data` to a Tavily endpoint like `TavilyClient` does, over `_session`."""
+    try:
+        response = _session.post(
+            f"{tavily_client.base_url}/{endpoint}",
+            json=data,
+            headers=tavily_client.headers,
+            timeout=tavily_client.timeout,
+        )
+    except requests.exceptions.Timeout:
+        raise TavilyTimeoutError(
+            f"Request timed out after {tavily_client.timeout} seconds"
+        )
+    except requests.exceptions.RequestException as e:
+        raise TavilyError(f"Request failed: {str(e)}")
+
+    if response.status_code != 200:
+        tavily_client._handle_error(response)
+    return response.json()
+
+
 def search(
     query: str,
     topic: Optional[Literal["general", "news", "finance"]] = None,
@@ -43,36 +93,52 @@ def search(
     include_domains: Optional[list[str]] = None,
     exclude_domains: Optional[list[str]] = None,
 ) -> list[dict[str, Any]] | tuple[list[dict[str, Any]], list[dict[str, str]]]:
-    args: dict[str, Any] = {}
-
-    if topic:
-        args["topic"] = topic
-
-    if time_range:
-        args["time_range"] = time_range
-
-    if start_date:
-        args["start_date"] = start_date
-
-    if end_date:
-        args["end_date"] = end_date
-
-    if max_results:
+    # unset, empty and False values are left to the API defaults, as the SDK does;
+    # max_results is the exception, since 0 is a real value there
+    args: dict[str, Any] = {
+        k: v
+        for k, v in {
+            "topic": topic,
+            "time_range": time_range,
+            "start_date": start_date,
+            "end_date": end_date,
+            "include_images": include_images,
+            "include_image_descriptions": include_image_descriptions,
+            "include_domains": include_domains,
+            "exclude_domains": exclude_domains,
+        }.items()
+        if v
+    }
+    if max_results is not None:
         args["max_results"] = max_results
 
-    if include_images:
-        args["include_images"] = include_images
-
-    if include_image_descriptions:
-        args["include_image_descriptions"] = include_image_descriptions
-
-    if include_domains:
-        args["include_domains"] = include_domains
-
-    if exclude_domains:
-        args["exclude_domains"] = exclude_domains
-
-    response = tavily_client.search(query, **args)
+    key = (
+        query,
+        topic,
+        time_range,
+        start_date,
+        end_date,
+        max_results,
+        include_images,
+        include_image_descriptions,
+        tuple(include_domains or ()),
+        tuple(exclude_domains or ()),
+    )
+    response = _search_cache.get(key)
+    if response is None:
+        # the SDK's defaults, overridden by whatever was passed
+        response = _post(
+            "search",
+            {
+                "query": query,
+                "search_depth": "basic",
+                "max_results": 5,
+                "include_answer": False,
+                "include_raw_content": False,
+                **args,
+            },
+        )
+        _search_cache[key] = response
 
     image_responses = []
 
@@ -87,12 +153,20 @@ def search(
 def visit(
     url: str | list[str], include_images: bool = False
 ) -> list[dict[str, str | list]]:
-    if isinstance(url, str):
-        url = [url]
-
-    url: list[str] = [url] if isinstance(url, str) else url
-
-    response = tavily_client.extract(
-        url, include_images=include_images, extract_depth="advanced"
-    )
+    # one extract call for all urls, each requested once
+    urls: list[str] = [url] if isinstance(url, str) else list(dict.fromkeys(url))
+
+    key = (tuple(urls), include_images)
+    response = _visit_cache.get(key)
+    if response is None:
+        response = _post(
+            "extract",
+            {
+                "urls": urls,
+                "include_images": include_images,
+                "format": "markdown",
+                "extract_depth": "advanced",
+            },
+        )
+        _visit_cache[key] = response
     return response["results"]
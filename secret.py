@@ -16,21 +16,7 @@ assert method == "encode" or method == "decode"
 
 match method:
     case "encode":
-        print(
-            b85encode(
-                codecs.encode("".join(reversed(message)), "rot13").encode("utf-8")
-            ).decode()
-        )
+        print(b85encode(codecs.encode(message[::-1], "rot13").encode("utf-8")).decode())
     case "decode":
-        print(
-            "".join(
-                reversed(
-                    codecs.decode(
-                        b85decode(
-                            message.encode("utf-8"),
-                        ).decode(),
-                        "rot13",
-                    )
-                )
-            )
-        )
+        # b85decode takes the ASCII text as is, no need to encode it first
+        print(codecs.decode(b85decode(message).decode(), "rot13")[::-1])
@@ -8,21 +8,26 @@ import graph
 import containers
 import search
 import image
+from ttl_cache import TTLCache
 
 # import requests
 
+import asyncio
 import os
+import re
+import shutil
 import stat
 import tempfile
 import uuid
 import io
 import matplotlib
 import tarfile
-from matplotlib._pylab_helpers import Gcf
 
 import pandas as pd
 
-from typing import Optional, Literal, Annotated
+from bisect import bisect_left
+from collections import defaultdict
+from typing import IO, Callable, NamedTuple, Optional, Literal, Annotated
 
 FILES_DIR = os.path.join(tempfile.gettempdir(), "mcp_files")
 os.makedirs(FILES_DIR, exist_ok=True)
@@ -31,15 +36,11 @@ PATH = os.path.abspath(FILES_DIR)
 matplotlib.use("Agg")
 
 
-def _save_file_to_disk(
-    filename: str, data: bytes | str, method="b", use_uuid=True
-) -> str:
+def _dest_path(filename: str, use_uuid=True) -> str:
     """
-    Save `data` to FILES_DIR using a sanitized filename.
+    Where `filename` goes in FILES_DIR.
     - prevents directory traversal by using only the basename
     - if a file with the same name exists, appends a short uuid
-    - sets restrictive owner read/write permissions when possible
-    Returns the absolute path to the saved file.
     """
 
     base = os.path.basename(filename)
@@ -55,11 +56,11 @@ def _save_file_to_disk(
         else:
             os.path.join(FILES_DIR, f"{name}")
 
-    tmp_path = dest + f".tmp-{uuid.uuid4().hex}"
-    with open(tmp_path, "w" + method, encoding="utf-8" if method != "b" else None) as f:
-        f.write(data)
-        f.flush()
-        os.fsync(f.fileno())
+    return dest
+
+
+def _publish(tmp_path: str, dest: str) -> str:
+    """Move a finished tmp file into place with owner-only permissions, return its link."""
 
     os.replace(tmp_path, dest)
 
@@ -71,9 +72,50 @@ def _save_file_to_disk(
     return "file:///" + os.path.abspath(dest)
 
 
+def _save_file_to_disk(
+    filename: str, data: bytes | str, method="b", use_uuid=True, durable=False
+) -> str:
+    """
+    Save `data` to FILES_DIR using a sanitized filename (see `_dest_path`).
+    - sets restrictive owner read/write permissions when possible
+    - only fsyncs with `durable=True`; everything here is scratch output under
+      the temp dir, so a disk barrier per file is not worth its cost
+    Returns the absolute path to the saved file.
+    """
+
+    dest = _dest_path(filename, use_uuid)
+    tmp_path = dest + f".tmp-{uuid.uuid4().hex}"
+    with open(tmp_path, "w" + method, encoding="utf-8" if method != "b" else None) as f:
+        f.write(data)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+
+    return _publish(tmp_path, dest)
+
+
+def _save_fileobj_to_disk(filename: str, src: IO[bytes], durable=False) -> str:
+    """
+    Like `_save_file_to_disk`, but copies from the binary file `src` in 1 MiB
+    chunks, so the payload is never held in memory as a whole.
+    """
+
+    dest = _dest_path(filename)
+    tmp_path = dest + f".tmp-{uuid.uuid4().hex}"
+    with open(tmp_path, "wb") as f:
+        shutil.copyfileobj(src, f, 1 << 20)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+
+    return _publish(tmp_path, dest)
+
+
 def _save_fig_to_bytes(fig, fmt: str = "png") -> bytes:
     buf = io.BytesIO()
-    fig.savefig(buf, format=fmt, bbox_inches="tight")
+    # previews only, so favour encode speed over file size (zlib defaults to 6)
+    extra = {"pil_kwargs": {"compress_level": 1}} if fmt == "png" else {}
+    fig.savefig(buf, format=fmt, bbox_inches="tight", **extra)
     buf.seek(0)
     return buf.read()
 
@@ -94,6 +136,18 @@ def _fig_to_compatible_output(fig) -> ImageContent:
     return _make_imagecontent_from_bytes(data, fmt="png")
 
 
+def _pil_to_compatible_output(img) -> ImageContent:
+    """
+    Same as `_fig_to_compatible_output`, for images that are already rendered
+    """
+
+    buf = io.BytesIO()
+    img.save(buf, format="png", compress_level=1)
+    data = buf.getvalue()
+    _save_file_to_disk(f"{uuid.uuid4().hex}.png", data, "b")
+    return _make_imagecontent_from_bytes(data, fmt="png")
+
+
 mcp = FastMCP(
     "Demo",
     instructions="""
@@ -147,22 +201,107 @@ Here's your PDF report: [report.pdf](file:///path/provided/by/file_link)
               """,
 )
 
-graphs: dict[str, tuple[ImageContent, pd.DataFrame, list[str]]] = {}
-container: Container
+graphs: dict[str, tuple[ImageContent, pd.DataFrame, list[str], "_GraphIndex"]] = {}
 files: list[str] = []
 
+_disposals: dict[str, asyncio.Task] = {}
+
+
+def _dispose(name: str, container: Container) -> None:
+    # removing takes up to ~10 s, so it runs in a worker thread; the task is
+    # kept so venv can wait for it before reusing the name
+    task = asyncio.get_running_loop().create_task(
+        asyncio.to_thread(containers.remove_container, container)
+    )
+    _disposals[name] = task
+    task.add_done_callback(
+        lambda t: _disposals.pop(name) if _disposals.get(name) is t else None
+    )
+
+
+# running environments by name; one left idle for 30 minutes or pushed out by
+# newer ones is removed so it does not linger in docker
+_containers = TTLCache(maxsize=8, ttl=1800, on_evict=_dispose, sliding=True)
+_containers_lock = asyncio.Lock()
+_last_venv: Optional[str] = None
+
+
+def _container(env: Optional[str]) -> Container:
+    """Environment `env`, or the most recently created one if not given."""
+    env = env or _last_venv
+    _containers.expire()
+    c = _containers.get(env) if env else None
+    if c is None:
+        raise ValueError(
+            f"No environment named `{env}`, create one with the venv tool"
+            if env
+            else "No environment yet, create one with the venv tool"
+        )
+    return c
+
+
+_WORD = re.compile(r"\w+")
+
+
+class _GraphIndex(NamedTuple):
+    # word, case kept (the final substring test is case-sensitive too) -> indices
+    # of the sentences containing it
+    postings: dict[str, set[int]]
+    # every suffix of every word as (suffix, offset in the word, word), sorted, so
+    # the words containing, starting or ending with a string are one bisect away;
+    # costs one entry per character of vocabulary, built once per graph update
+    suffixes: list[tuple[str, int, str]]
+
+
+def _index_sentences(sentences: list[str]) -> _GraphIndex:
+    postings: dict[str, set[int]] = defaultdict(set)
+    for i, sentence in enumerate(sentences):
+        for token in _WORD.findall(sentence):
+            postings[token].add(i)
+    suffixes = sorted(
+        (word[k:], k, word) for word in postings for k in range(len(word))
+    )
+    return _GraphIndex(dict(postings), suffixes)
+
+
+def _candidates(index: _GraphIndex, querry: str) -> Optional[set[int]]:
+    """
+    Superset of the sentences that can contain `querry`, or None if the query
+    has no words to narrow it down with. A word with non-word characters on
+    both sides in the query is a whole word in the sentence too and is looked up
+    directly. The first word may end a longer word, the last may start one (and
+    a lone word may sit anywhere in one), so those go through `suffixes`.
+    """
+    found: Optional[set[int]] = None
+    for m in _WORD.finditer(querry):
+        token = m.group()
+        open_start, open_end = m.start() == 0, m.end() == len(querry)
+        if not (open_start or open_end):
+            postings = index.postings.get(token, set())
+        else:
+            postings = set()
+            i = bisect_left(index.suffixes, (token,))
+            while i < len(index.suffixes) and index.suffixes[i][0].startswith(token):
+                suffix, offset, word = index.suffixes[i]
+                if (open_start or offset == 0) and (open_end or suffix == token):
+                    postings |= index.postings[word]
+                i += 1
+        found = postings if found is None else found & postings
+        if not found:
+            return set()
+    return found
+
 
 @mcp.tool()
 async def knowledge_graph(
     name: str, graph_data: list[str], ctx: Context[ServerSession, None]
 ) -> tuple[ImageContent, str, dict]:
     """Create a Knowledge Graph with the name `name`"""
-    data = await graph.knowledge_graph(name, graph_data, ctx)
-
-    active_managers = Gcf.get_all_fig_managers()
-    fig = active_managers[-1].canvas.figure
-    img = _fig_to_compatible_output(fig)
-    graphs[name] = img, data, graph_data
+    data, fig = await graph.knowledge_graph(name, graph_data, ctx, draw=True)
+    # PNG encoding and the disk write, like every other blocking step, go
+    # through a worker thread so other tool calls keep running
+    img = await asyncio.to_thread(_fig_to_compatible_output, fig)
+    graphs[name] = img, data, graph_data, _index_sentences(graph_data)
 
     return img, f"Created Graph `{name}` with data: ", data.to_dict()["sentence"]
 
@@ -182,131 +321,146 @@ async def update_graph(
 ) -> tuple[ImageContent, str, dict]:
     """Update the Knowleadge graph `name` by adding `new_data` and removing `removable_data`"""
 
-    for x in removable_data:
-        if x in graphs[name][2]:
-            graphs[name][2].remove(x)
-
-    import matplotlib.pyplot as plt
-
-    plt.close("all")
-    merged_input = [*graphs[name][2], *new_data]
+    removable = set(removable_data)
+    kept = [x for x in graphs[name][2] if x not in removable]
 
-    data = await graph.knowledge_graph(name, merged_input, ctx)
+    merged_input = [*kept, *new_data]
 
-    active_managers = Gcf.get_all_fig_managers()
+    data, fig = await graph.knowledge_graph(name, merged_input, ctx, draw=True)
+    img = await asyncio.to_thread(_fig_to_compatible_output, fig)
 
-    fig = active_managers[-1].canvas.figure
-    img = _fig_to_compatible_output(fig)
-
-    graphs[name] = img, data, merged_input
+    graphs[name] = img, data, merged_input, _index_sentences(merged_input)
     return img, f"Updated Graph `{name}`. Data: ", data.to_dict()["sentence"]
 
 
 @mcp.tool()
 async def querry_graph(name: str, querry: str, ctx: Context[ServerSession, None]):
-    results = []
-    for i in graphs[name][2]:
-        if querry in i:
-            results.append(i)
-    return results
+    _, _, sentences, index = graphs[name]
+    found = _candidates(index, querry)
+    candidates = range(len(sentences)) if found is None else sorted(found)
+    # the index only narrows things down, the substring test stays the judge
+    return [sentences[i] for i in candidates if querry in sentences[i]]
 
 
 @mcp.tool()
 async def venv(name: str):
     """Create a virtual environment with python preinstalled"""
-    global container
-    container = await containers.init_container(name)
+    global _last_venv
+    async with _containers_lock:
+        _last_venv = name
+        _containers.expire()
+        existing = _containers.get(name)
+        if existing is not None:
+            # no-op if it is running, brings it back after stop_venv
+            await asyncio.to_thread(existing.start)
+            return "Already running"
+        if name in _disposals:
+            await _disposals[name]
+        _containers[name] = await containers.init_container(name)
     return "Done!"
 
 
 @mcp.tool()
-async def run_py(code: str, name: str = "main.py"):
-    """Run Python code in a environment (create with the venv tool)"""
-    path = _save_file_to_disk(name, code, "", False).removeprefix("file:///")
-    containers.upload_file(path, container)
-    return containers.run_script(name, container)
+async def run_py(code: str, name: str = "main.py", env: Optional[str] = None):
+    """Run Python code in the environment `env` (create with the venv tool, defaults to the latest one)"""
+    container = _container(env)
+    link = await asyncio.to_thread(_save_file_to_disk, name, code, "", False)
+    path = link.removeprefix("file:///")
+    await asyncio.to_thread(containers.upload_file, path, container)
+    return await asyncio.to_thread(containers.run_script, name, container)
 
 
 @mcp.tool()
-async def run_cmd(cmd: str):
-    """Run the command `cmd` in a environment (create with the venv tool)"""
-    return containers.run_command(cmd, container)
+async def run_cmd(cmd: str, env: Optional[str] = None):
+    """Run the command `cmd` in the environment `env` (create with the venv tool, defaults to the latest one)"""
+    return await asyncio.to_thread(containers.run_command, cmd, _container(env))
 
 
 @mcp.tool()
-async def pip_install(packages: Annotated[str, "Packages separates by a space (` `)"]):
+async def pip_install(
+    packages: Annotated[str, "Packages separates by a space (` `)"],
+    env: Optional[str] = None,
+):
     """Install python packages using pip"""
-    return containers.run_command(
-        f"pip install {packages} --progress-bar off --no-color", container
+    return await asyncio.to_thread(
+        containers.run_command,
+        f"pip install {packages} --progress-bar off --no-color",
+        _container(env),
     )
 
 
+def _handle_pdf(name: str, f: IO[bytes], ext: str) -> list[str | ImageContent]:
+    link = _save_fileobj_to_disk(name, f)
+    return [f"Name: `{name}`", "File type: `PDF`", f"file_link: `{link}`"]
+
+
+def _handle_image(name: str, f: IO[bytes], ext: str) -> list[str | ImageContent]:
+    # the bytes are needed for the ImageContent anyway
+    blob = f.read()
+    image_ = _make_imagecontent_from_bytes(blob)
+    link = _save_file_to_disk(name, blob)
+    return [f"Name: `{name}`", "File type: `Image`", image_, f"file_link: `{link}`"]
+
+
+def _handle_word(name: str, f: IO[bytes], ext: str) -> list[str | ImageContent]:
+    link = _save_fileobj_to_disk(name, f)
+    return [f"Name: `{name}`", "File type: `Word Document`", f"file_link: `{link}`"]
+
+
+def _handle_unknown(name: str, f: IO[bytes], ext: str) -> list[str | ImageContent]:
+    # shown inline below, so read it whole
+    blob = f.read()
+    link = _save_file_to_disk(name, blob)
+    return [
+        f"Name: `{name}`",
+        f"File type: `{ext}` (Unknown)",
+        f"contents: `{blob}`",
+        f"file_link: `{link}`",
+    ]
+
+
+_EXT_HANDLERS: dict[str, Callable[[str, IO[bytes], str], list[str | ImageContent]]] = {
+    "pdf": _handle_pdf,
+    **dict.fromkeys(("png", "jpg", "jpeg", "gif", "webp", "avif"), _handle_image),
+    "doc": _handle_word,
+    "docx": _handle_word,
+}
+
+
+def _walk_archive(stream: IO[bytes]) -> list[list[str | bytes | ImageContent]]:
+    rows: list[list[str | bytes | ImageContent]] = []
+    # "r|" walks the archive as it arrives instead of buffering it whole
+    with tarfile.open(fileobj=stream, mode="r|") as tf:
+        for member in tf:
+            f = tf.extractfile(member)
+            if f:
+                ext = os.path.splitext(member.name)[1].lstrip(".").lower()
+                handler = _EXT_HANDLERS.get(ext, _handle_unknown)
+                rows.append(handler(member.name, f, ext))
+    return rows
+
+
 @mcp.tool()
 async def retrieve_files(
     files: list[str],
+    env: Optional[str] = None,
 ) -> list[list[str | bytes | ImageContent]]:
-    final: list[list[str | bytes | ImageContent]] = []
-    tars: list[bytes] = containers.download_files(container, files)
-    for tar_bytes in tars:
-        with io.BytesIO(tar_bytes) as bio, tarfile.open(fileobj=bio) as tf:
-            for member in tf.getmembers():
-                f: Optional[io.BytesIO] = tf.extractfile(member)
-                if f:
-                    match member.name.split(".")[-1].lower():
-                        case "pdf":
-                            link = _save_file_to_disk(member.name, f.read())
-                            final.append(
-                                [
-                                    f"Name: `{member.name}`",
-                                    "File type: `PDF`",
-                                    f"file_link: `{link}`",
-                                ]
-                            )
-                        case "png" | "jpg" | "jpeg" | "gif" | "webp" | "avif":
-                            image_ = _make_imagecontent_from_bytes(f.read())
-                            link = _save_file_to_disk(member.name, f.read())
-                            final.append(
-                                [
-                                    f"Name: `{member.name}`",
-                                    "File type: `Image`",
-                                    image_,
-                                    f"file_link: `{link}`",
-                                ]
-                            )
-                        case "doc" | "docx":
-                            link = _save_file_to_disk(member.name, f.read())
-                            final.append(
-                                [
-                                    f"Name: `{member.name}`",
-                                    "File type: `Word Document`",
-                                    f"file_link: `{link}`",
-                                ]
-                            )
-                        case _:
-                            link = _save_file_to_disk(member.name, f.read())
-                            final.append(
-                                [
-                                    f"Name: `{member.name}`",
-                                    f"File type: `{member.name.split(".")[-1].lower()}` (Unknown)",
-                                    f"contents: `{f.read()}`",
-                                    f"file_link: `{link}`",
-                                ]
-                            )
-
-    return final
+    # the archives are read and their members saved in worker threads
+    walked = await containers.download_files(_container(env), files, _walk_archive)
+    return [row for rows in walked for row in rows]
 
 
 @mcp.tool()
-async def stop_venv():
+async def stop_venv(env: Optional[str] = None):
     """Stop a virtual environment. Always use after finishing."""
-    container.stop()
+    await asyncio.to_thread(_container(env).stop)
     return "Done!"
 
 
 @mcp.tool()
-async def restart_venv():
+async def restart_venv(env: Optional[str] = None):
     """Restart a virtual environment after stoping it"""
-    container.start()
+    await asyncio.to_thread(_container(env).start)
     return "Done!"
 
 
@@ -324,7 +478,10 @@ async def web_search(
     exclude_domains: Optional[list[str]] = None,
 ):
     """Search the web on a topic. Use citations as explained in the instructions."""
-    s = search.search(
+    # the Tavily round trip would otherwise block the event loop, and with it
+    # every other tool call in flight
+    s = await asyncio.to_thread(
+        search.search,
         query,
         topic,
         time_range,
@@ -340,29 +497,24 @@ async def web_search(
 
 
 @mcp.tool()
-async def visit(url: str) -> list[dict[str, str | list]]:
-    """Visit a url. Optainable using `web_search`. Use citations as explained in the instructions."""
-    return search.visit(url)
+async def visit(url: str | list[str]) -> list[dict[str, str | list]]:
+    """Visit one or more urls. Optainable using `web_search`. Use citations as explained in the instructions.
+    To read several pages, collect their urls and pass them together as a list."""
+    return await asyncio.to_thread(search.visit, url)
 
 
 @mcp.tool()
 async def split_image(path: str, num_squares: tuple[int, int] = (10, 8)):
-    image.split_image(path, num_squares)
-
-    active_managers = Gcf.get_all_fig_managers()
-    fig = active_managers[-1].canvas.figure
-    img = _fig_to_compatible_output(fig)
+    split = await asyncio.to_thread(image.split_image, path, num_squares)
+    img = await asyncio.to_thread(_pil_to_compatible_output, split)
 
     return img
 
 
 @mcp.tool()
 async def ocr(path: str):
-    out = image.ocr(path)
-
-    active_managers = Gcf.get_all_fig_managers()
-    fig = active_managers[-1].canvas.figure
-    img = _fig_to_compatible_output(fig)
+    out, boxed = await asyncio.to_thread(image.ocr, path)
+    img = await asyncio.to_thread(_pil_to_compatible_output, boxed)
 
     return img, out
 
@@ -2,60 +2,74 @@ from typing import Any
 
 
 class HistoryValue:
-    __values: list[Any] = []
-    __cursor = 0
-    __iterator_count = 0
-    __before = ([], 0)
-
     def __init__(self, value: Any) -> None:
-        self.__values.insert(self.__cursor, value)
-        self.__cursor += 1
+        # per instance: class-level defaults would be one list shared by all of them
+        # __past ends with the current value, __future holds undone values with
+        # the next one to redo last, so every step is an append/pop at the end
+        self.__past: list[Any] = [value]
+        self.__future: list[Any] = []
+        # __past[-1], kept as a field so reads are a plain attribute load
+        self.__current = value
+        self.__iterator_count = 0
 
     def set(self, value: Any) -> None:
-        self.__values.insert(self.__cursor, value)
-        self.__cursor += 1
+        self.__past.append(value)
+        self.__future.clear()
+        self.__current = value
 
     def undo(self, steps=1) -> None:
-        self.__cursor -= steps
+        # the first value is never undone, there has to be a current one
+        for _ in range(min(steps, len(self.__past) - 1)):
+            self.__future.append(self.__past.pop())
+        self.__current = self.__past[-1]
 
     def redo(self, steps=1) -> None:
-        self.__cursor += steps
-
-    def revert(self, to=0, keep_history=True | False) -> None:
-        self.__cursor = to + 1
-        self.__values = (
-            [self.__values[self.__cursor]] if keep_history is False else self.__values
-        )
+        for _ in range(min(steps, len(self.__future))):
+            self.__past.append(self.__future.pop())
+        self.__current = self.__past[-1]
+
+    def revert(self, to=0, keep_history: bool = True) -> None:
+        timeline = self.history
+        if keep_history:
+            self.__past = timeline[: to + 1]
+            self.__future = timeline[:to:-1]
+        else:
+            self.__past = [timeline[to]]
+            self.__future = []
+        self.__current = self.__past[-1]
 
     def clear_history(self) -> None:
-        self.__values = self.__values[self.__cursor]
+        self.__past = [self.__past[-1]]
+        self.__future = []
 
     def __len__(self) -> int:
-        return len(self.__values)
+        return len(self.__past) + len(self.__future)
 
     def __eq__(self, value: object) -> bool:
-        return self.__values[self.__cursor - 1] == value
+        return self.__current == value
 
     def __repr__(self) -> str:
-        # return repr(self.__values[self.__cursor - 1])
-        return f"History: {self.__values} \nCurrent Value: {self.__values[self.__cursor - 1]}"
+        # return repr(self.__current)
+        return f"History: {self.history} \nCurrent Value: {self.__current}"
 
     def __rshift__(self, ammount: int) -> None:
-        self.__cursor += ammount
+        self.redo(ammount)
 
     def __lshift__(self, ammount: int) -> None:
-        self.__cursor -= ammount
+        self.undo(ammount)
 
     def __iter__(self):
         self.__iterator_count = 0
         return self
 
     def __next__(self):
-        if self.__iterator_count >= len(self.__values):
+        i = self.__iterator_count
+        if i >= len(self):
             raise StopIteration
-        value = self.__values[self.__iterator_count]
         self.__iterator_count += 1
-        return value
+        if i < len(self.__past):
+            return self.__past[i]
+        return self.__future[len(self.__past) - i - 1]
 
     # def __enter__(self):
     #     self.__before = (self.__values, self.__cursor)
@@ -74,11 +88,11 @@ class HistoryValue:
 
     @property
     def value(self) -> Any:
-        return self.__values[self.__cursor - 1]
+        return self.__current
 
     @property
     def history(self) -> Any:
-        return self.__values
+        return self.__past + self.__future[::-1]
 
 
 v = HistoryValue(10)
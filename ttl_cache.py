@@ -0,0 +1,81 @@
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire `ttl` seconds after being set
+    (the subset of cachetools.TTLCache used here, without the extra dependency).
+    With `sliding=True` every `get` pushes the deadline back, so `ttl` is idle time.
+    `on_evict(key, value)` is called, outside the lock, for entries dropped
+    because they expired or the cache overflowed.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+        sliding: bool = False,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.sliding = sliding
+        self.__items: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.__lock:
+            item = self.__items.get(key)
+            if item is None:
+                return default
+
+            expires, value = item
+            now = time.monotonic()
+            if expires > now:
+                if self.sliding:
+                    self.__items[key] = (now + self.ttl, value)
+                self.__items.move_to_end(key)
+                return value
+
+            del self.__items[key]
+
+        self.__evicted([(key, value)])
+        return default
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        evicted = []
+        with self.__lock:
+            self.__items[key] = (time.monotonic() + self.ttl, value)
+            self.__items.move_to_end(key)
+            while len(self.__items) > self.maxsize:
+                old_key, (_, old_value) = self.__items.popitem(last=False)
+                evicted.append((old_key, old_value))
+
+        self.__evicted(evicted)
+
+    def expire(self) -> None:
+        """Drop every expired entry, not just the ones being looked up."""
+        with self.__lock:
+            now = time.monotonic()
+            evicted = [(k, v) for k, (e, v) in self.__items.items() if e <= now]
+            for key, _ in evicted:
+                del self.__items[key]
+
+        self.__evicted(evicted)
+
+    def __contains__(self, key: Hashable) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def __evicted(self, items: list[tuple[Hashable, Any]]) -> None:
+        if self.on_evict is not None:
+            for key, value in items:
+                self.on_evict(key, value)
+
+    def __len__(self) -> int:
+        return len(self.__items)